@@ -3,10 +3,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.routers import upload, verify, dashboard
 from app.services.database import init_databases
+from app.services.log_compaction import compaction_loop
+from app.services.ocr_service import tier_hit_rates
+from app.services.qr_service import QRService
+from app.utils.metrics import metrics
+from app.utils.config import VERIFICATION_LOG_COMPACTION_INTERVAL, ADMISSION_CONTROL
+from app.utils.admission import AdmissionControlMiddleware
+import asyncio
 import os
 
 app = FastAPI(title="Certificate Authenticity Validator", version="1.0.0")
 
+# Admission control (added before CORS so rejections still carry CORS headers)
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionControlMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,7 +38,10 @@ app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"]
 
 @app.on_event("startup")
 async def startup_event():
+    QRService()  # Fails fast if signed QR tokens are enabled without a private SECRET_KEY
     await init_databases()
+    if VERIFICATION_LOG_COMPACTION_INTERVAL > 0:
+        app.state.compaction_task = asyncio.create_task(compaction_loop())
 
 @app.get("/")
 async def root():
@@ -35,4 +49,10 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics")
+async def get_metrics():
+    snapshot = metrics.snapshot()
+    snapshot["ocr_tier_hit_rates"] = tier_hit_rates()
+    return snapshot
\ No newline at end of file
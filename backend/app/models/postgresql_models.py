@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, LargeBinary, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Date, Text, Float, Boolean, LargeBinary, JSON, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from datetime import datetime
 
@@ -14,26 +15,50 @@ class Certificate(Base):
     student_name = Column(String)
     course_name = Column(String)
     certificate_type = Column(String)  # 'legacy' or 'digital'
-    extracted_text = Column(Text)
+    extracted_text = deferred(Column(Text))  # Loaded on access; listings never need it
     issue_date = Column(DateTime)
-    upload_date = Column(DateTime, default=func.now())
+    upload_date = Column(DateTime, default=func.now(), index=True)
     is_verified = Column(Boolean, default=False)
     confidence_score = Column(Float, default=0.0)
 
     # Add these fields for file storage
-    file_data = Column(LargeBinary)
+    file_data = deferred(Column(LargeBinary))
     file_name = Column(String)
     file_type = Column(String)
     file_size = Column(Integer)
-    qr_code_data = Column(JSON, nullable=True)  # Only for digital certificates
+    qr_code_data = deferred(Column(JSON, nullable=True))  # Only for digital certificates
 
 class VerificationLog(Base):
     __tablename__ = "verification_logs"
+    __table_args__ = (
+        # Time-window dashboard queries group by result within a date range
+        Index("ix_verification_logs_date_result", "verification_date", "verification_result"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     certificate_id = Column(String, index=True)
-    verification_date = Column(DateTime, default=func.now())
+    verification_date = Column(DateTime, default=func.now())  # Indexed by ix_verification_logs_date_result
     verification_result = Column(String)  # 'valid', 'invalid', 'not_found'
     confidence_score = Column(Float)
     user_ip = Column(String)
 
+class VerificationLogRollup(Base):
+    """Daily per-result aggregates of verification logs older than the retention period"""
+    __tablename__ = "verification_log_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "verification_result", name="uq_verification_log_rollups_day_result"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    verification_result = Column(String)
+    count = Column(Integer, default=0)
+    confidence_sum = Column(Float, default=0.0)
+
+class RevokedCertificate(Base):
+    __tablename__ = "revoked_certificates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    certificate_id = Column(String, unique=True, index=True)
+    revoked_at = Column(DateTime, default=func.now())
+    reason = Column(String, nullable=True)
@@ -1,13 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, or_
 from app.services.database import get_db_session
-from app.models.postgresql_models import Certificate, VerificationLog
+from app.models.postgresql_models import Certificate, VerificationLog, VerificationLogRollup, RevokedCertificate
+from app.services.revocation_service import revocation_cache
+from app.utils.auth import require_admin_key
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import base64
 
 router = APIRouter()
 
+# Light metadata columns returned by the certificate listing (never the file or OCR text)
+LIST_COLUMNS = (
+    Certificate.id,
+    Certificate.certificate_id,
+    Certificate.institution_name,
+    Certificate.student_name,
+    Certificate.course_name,
+    Certificate.certificate_type,
+    Certificate.issue_date,
+    Certificate.upload_date,
+    Certificate.is_verified,
+    Certificate.file_name,
+    Certificate.file_type,
+    Certificate.file_size,
+)
+
+def _encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/analytics")
 async def get_dashboard_analytics(db: Session = Depends(get_db_session)):
     """Get dashboard analytics data"""
@@ -27,13 +56,24 @@ async def get_dashboard_analytics(db: Session = Depends(get_db_session)):
             Certificate.upload_date >= thirty_days_ago
         ).count()
         
-        # Verification statistics
-        total_verifications = db.query(VerificationLog).count()
+        # Verification statistics (raw logs within retention plus compacted daily rollups)
+        compacted_verifications = db.query(
+            func.coalesce(func.sum(VerificationLogRollup.count), 0)
+        ).scalar()
+        total_verifications = db.query(VerificationLog).count() + compacted_verifications
         
-        verification_results = db.query(
+        result_counts = {}
+        raw_results = db.query(
             VerificationLog.verification_result,
             func.count(VerificationLog.id).label('count')
         ).group_by(VerificationLog.verification_result).all()
+        rollup_results = db.query(
+            VerificationLogRollup.verification_result,
+            func.sum(VerificationLogRollup.count).label('count')
+        ).group_by(VerificationLogRollup.verification_result).all()
+        for result, count in list(raw_results) + list(rollup_results):
+            result_counts[result] = result_counts.get(result, 0) + int(count or 0)
+        verification_results = list(result_counts.items())
         
         # Recent verifications (last 7 days)
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
@@ -72,3 +112,105 @@ async def get_dashboard_analytics(db: Session = Depends(get_db_session)):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analytics fetch failed: {str(e)}")
+
+
+@router.get("/certificates")
+async def list_certificates(
+    institution: Optional[str] = None,
+    certificate_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db_session)
+):
+    """List and search certificates, newest first, with keyset pagination
+
+    Pass the returned ``next_cursor`` back as ``cursor`` to fetch the next page.
+    ``date_from``/``date_to`` filter on upload date; ``q`` matches student,
+    course or institution names.
+    """
+    after_id = _decode_cursor(cursor) if cursor else None
+    
+    try:
+        query = db.query(*LIST_COLUMNS)
+        
+        if institution:
+            query = query.filter(Certificate.institution_name == institution)
+        if certificate_type:
+            query = query.filter(Certificate.certificate_type == certificate_type)
+        if date_from:
+            query = query.filter(Certificate.upload_date >= date_from)
+        if date_to:
+            query = query.filter(Certificate.upload_date < date_to)
+        if q:
+            pattern = f"%{q}%"
+            query = query.filter(or_(
+                Certificate.student_name.ilike(pattern),
+                Certificate.course_name.ilike(pattern),
+                Certificate.institution_name.ilike(pattern)
+            ))
+        
+        # Seek past the previous page instead of using OFFSET
+        if after_id is not None:
+            query = query.filter(Certificate.id < after_id)
+        
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(Certificate.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return {
+            "items": [
+                {
+                    "certificate_id": row.certificate_id,
+                    "institution_name": row.institution_name,
+                    "student_name": row.student_name,
+                    "course_name": row.course_name,
+                    "certificate_type": row.certificate_type,
+                    "issue_date": row.issue_date.isoformat() if row.issue_date else None,
+                    "upload_date": row.upload_date.isoformat() if row.upload_date else None,
+                    "is_verified": row.is_verified,
+                    "file_name": row.file_name,
+                    "file_type": row.file_type,
+                    "file_size": row.file_size
+                }
+                for row in rows
+            ],
+            "next_cursor": _encode_cursor(rows[-1].id) if has_more else None,
+            "has_more": has_more
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Certificate listing failed: {str(e)}")
+
+@router.post("/certificates/{certificate_id}/revoke", dependencies=[Depends(require_admin_key)])
+async def revoke_certificate(
+    certificate_id: str,
+    reason: Optional[str] = None,
+    db: Session = Depends(get_db_session)
+):
+    """Revoke a certificate so signed QR tokens for it stop verifying (requires the X-Admin-Key header)"""
+    exists = db.query(Certificate.id).filter(Certificate.certificate_id == certificate_id).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    
+    try:
+        already_revoked = db.query(RevokedCertificate.id).filter(
+            RevokedCertificate.certificate_id == certificate_id
+        ).first()
+        if not already_revoked:
+            db.add(RevokedCertificate(certificate_id=certificate_id, reason=reason))
+            db.commit()
+        revocation_cache.invalidate()
+        
+        return {
+            "success": True,
+            "certificate_id": certificate_id,
+            "message": "Certificate revoked"
+        }
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Revocation failed: {str(e)}")
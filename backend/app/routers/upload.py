@@ -1,14 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.services.database import get_db_session
-from app.services.ocr_service import OCRService
+from app.services.ocr_service import OCRService, OCRBudgetExceeded
 from app.services.qr_service import QRService
 from app.models.postgresql_models import Certificate
+from app.utils.certificate_fields import parse_certificate_fields
 import uuid
 from datetime import datetime
-import io
-from PIL import Image
-import re
 
 router = APIRouter()
 
@@ -44,39 +42,9 @@ async def upload_legacy_certificate(
             file_size=len(file_content)
         )
         
-        # Parse extracted text for additional fields (improved implementation)
-        # Try to match common labels using regex
-        text = extracted_text or ""
-        try:
-            # Institution
-            inst_match = re.search(r"(?:institution|college|university)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
-            if inst_match:
-                db_certificate.institution_name = inst_match.group(1).strip()
-
-            # Student name
-            student_match = re.search(r"(?:student\s*name|name)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
-            if student_match:
-                db_certificate.student_name = student_match.group(1).strip()
-
-            # Course name
-            course_match = re.search(r"(?:course\s*name|course|program|degree)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
-            if course_match:
-                db_certificate.course_name = course_match.group(1).strip()
-
-            # Issue/Date
-            date_match = re.search(r"(?:issue\s*date|date\s*of\s*issue|issued\s*on|date)\s*[:\-]?\s*([0-9]{1,2}[\-/ ]?[A-Za-z]{3,9}[\-/ ]?[0-9]{2,4}|[0-9]{4}[\-/][0-9]{2}[\-/][0-9]{2})", text, flags=re.IGNORECASE)
-            if date_match:
-                raw_date = date_match.group(1).strip()
-                # Best-effort parse a few common formats
-                for fmt in ("%d-%b-%Y", "%d %B %Y", "%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y"):
-                    try:
-                        db_certificate.issue_date = datetime.strptime(raw_date, fmt)
-                        break
-                    except Exception:
-                        continue
-        except Exception:
-            # Parsing should never crash the endpoint; continue with best-effort fields
-            pass
+        # Parse extracted text for additional fields
+        for field, value in parse_certificate_fields(extracted_text).items():
+            setattr(db_certificate, field, value)
 
         # Persist
         db.add(db_certificate)
@@ -94,6 +62,8 @@ async def upload_legacy_certificate(
             "message": "Legacy certificate processed successfully"
         }
         
+    except OCRBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=f"Processing rejected: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
@@ -114,22 +84,13 @@ async def upload_digital_certificate(
         # Generate unique certificate ID
         certificate_id = str(uuid.uuid4())
         
-        # Generate QR code
-        qr_service = QRService()
-        qr_data = await qr_service.generate_qr_code(certificate_id, {
-            "file_name": file.filename,
-            "file_type": file.content_type,
-            "upload_date": datetime.utcnow().isoformat()
-        })
-
         # Optionally extract text from digital certificate
         ocr_service = OCRService()
         extracted_text = None
         if file.content_type == "application/pdf":
             extracted_text = await ocr_service.extract_text_from_pdf(file_content)
         elif file.content_type in ["image/jpeg", "image/png"]:
-            image = Image.open(io.BytesIO(file_content))
-            extracted_text = await ocr_service.extract_text_from_image(image)
+            extracted_text = await ocr_service.extract_text_from_image_bytes(file_content)
 
         # Save to PostgreSQL (including file data, extracted text, and QR code data)
         db_certificate = Certificate(
@@ -140,23 +101,23 @@ async def upload_digital_certificate(
             file_data=file_content,
             file_name=file.filename,
             file_type=file.content_type,
-            file_size=len(file_content),
-            qr_code_data=qr_data
+            file_size=len(file_content)
         )
         # Try to parse key fields from OCR text if available
-        text = extracted_text or ""
-        try:
-            inst_match = re.search(r"(?:institution|college|university)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
-            if inst_match:
-                db_certificate.institution_name = inst_match.group(1).strip()
-            student_match = re.search(r"(?:student\s*name|name)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
-            if student_match:
-                db_certificate.student_name = student_match.group(1).strip()
-            course_match = re.search(r"(?:course\s*name|course|program|degree)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
-            if course_match:
-                db_certificate.course_name = course_match.group(1).strip()
-        except Exception:
-            pass
+        for field, value in parse_certificate_fields(extracted_text, include_issue_date=False).items():
+            setattr(db_certificate, field, value)
+
+        # Generate QR code (after parsing so a signed token can carry the key fields)
+        qr_service = QRService()
+        qr_data = await qr_service.generate_qr_code(certificate_id, {
+            "file_name": file.filename,
+            "file_type": file.content_type,
+            "upload_date": datetime.utcnow().isoformat(),
+            "institution_name": db_certificate.institution_name,
+            "student_name": db_certificate.student_name,
+            "course_name": db_certificate.course_name
+        })
+        db_certificate.qr_code_data = qr_data
         db.add(db_certificate)
         try:
             db.commit()
@@ -173,5 +134,7 @@ async def upload_digital_certificate(
             "message": "Digital certificate processed successfully"
         }
         
+    except OCRBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=f"Processing rejected: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
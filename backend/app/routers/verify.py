@@ -2,7 +2,9 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
 from sqlalchemy.orm import Session
 from app.services.database import get_db_session
 from app.services.verification_service import VerificationService
+from app.services.ocr_service import OCRBudgetExceeded
 from app.models.postgresql_models import VerificationLog
+from app.utils.config import VERIFY_EARLY_EXIT
 from datetime import datetime
 
 router = APIRouter()
@@ -11,9 +13,14 @@ router = APIRouter()
 async def verify_certificate(
     file: UploadFile = File(...),
     request: Request = None,
+    early_exit: bool = VERIFY_EARLY_EXIT,
     db: Session = Depends(get_db_session)
 ):
-    """Verify certificate authenticity"""
+    """Verify certificate authenticity
+
+    With ``early_exit`` the first page's text regions are read first and OCR
+    stops as soon as the best match is clearly decided.
+    """
     allowed_types = ["image/jpeg", "image/png", "application/pdf"]
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Only JPEG, PNG, and PDF files are allowed")
@@ -26,7 +33,9 @@ async def verify_certificate(
         verification_service = VerificationService()
         
         # Perform verification
-        verification_result = await verification_service.verify_certificate(file_content, file.content_type)
+        verification_result = await verification_service.verify_certificate(
+            file_content, file.content_type, early_exit=early_exit
+        )
         
         # Log verification attempt
         client_ip = request.client.host if request else "unknown"
@@ -46,6 +55,24 @@ async def verify_certificate(
             "timestamp": datetime.utcnow().isoformat()
         }
         
+    except OCRBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=f"Verification rejected: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
+
+@router.get("/token/{token}")
+async def verify_by_token(token: str):
+    """Verify a signed QR token without a certificate lookup"""
+    try:
+        verification_service = VerificationService()
+        result = await verification_service.verify_token(token)
+        
+        return {
+            "success": True,
+            "certificate_id": result.get("certificate_id"),
+            "verification_result": result
+        }
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
 
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
 from app.models.postgresql_models import Base
 
@@ -10,12 +10,25 @@ DATABASE_URL = os.getenv(
 )
 
 # PostgreSQL setup
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+# SQLite (used for local runs and load tests) needs cross-thread access for FastAPI's threadpool
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(DATABASE_URL, echo=False, future=True, connect_args=connect_args)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# Indexes earlier versions created that the current models no longer declare
+REDUNDANT_INDEXES = ["ix_verification_logs_verification_date"]
+
 async def init_databases():
     """Initialize databases (create tables if they don't exist)."""
     Base.metadata.create_all(bind=engine)
+    # create_all skips indexes on tables that already exist, so add any new ones
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    # ...and drop ones that newer indexes have superseded
+    with engine.begin() as conn:
+        for index_name in REDUNDANT_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
 
 def get_db_session() -> Session:
     """Dependency that provides a transactional database session."""
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timedelta, time
+from typing import Dict
+from sqlalchemy import func, and_, delete, select
+from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from app.services.database import SessionLocal
+from app.models.postgresql_models import VerificationLog, VerificationLogRollup
+from app.utils.config import (
+    VERIFICATION_LOG_RETENTION_DAYS, VERIFICATION_LOG_COMPACTION_INTERVAL, VERIFICATION_LOG_COMPACTION_BATCH,
+)
+
+def compact_verification_logs(
+    db: Session,
+    retention_days: int = VERIFICATION_LOG_RETENTION_DAYS,
+    batch_size: int = VERIFICATION_LOG_COMPACTION_BATCH
+) -> Dict[str, int]:
+    """Roll raw verification logs older than the retention period into daily aggregates and delete them.
+
+    Works one day at a time in chunks of ``batch_size`` rows, so memory and
+    transaction size stay bounded however busy a day was; each chunk's rollup
+    increment and the deletion of its raw rows are committed together. Rollups
+    are built from the rows a chunk actually deleted (DELETE ... RETURNING), so
+    when several workers compact concurrently each raw row is counted exactly once.
+    """
+    cutoff = datetime.combine((datetime.utcnow() - timedelta(days=retention_days)).date(), time.min)
+    days_compacted = 0
+    rows_compacted = 0
+
+    while True:
+        oldest = db.query(func.min(VerificationLog.verification_date)).filter(
+            VerificationLog.verification_date < cutoff
+        ).scalar()
+        if oldest is None:
+            break
+
+        day_start = datetime.combine(oldest.date(), time.min)
+        day_end = min(day_start + timedelta(days=1), cutoff)
+        in_day = and_(
+            VerificationLog.verification_date >= day_start,
+            VerificationLog.verification_date < day_end
+        )
+
+        day_rows = 0
+        while True:
+            deleted = _compact_chunk(db, day_start, in_day, batch_size)
+            if not deleted:
+                break
+            day_rows += deleted
+        if not day_rows:
+            # Another worker is compacting this day; leave the rest to it
+            break
+
+        rows_compacted += day_rows
+        days_compacted += 1
+
+    return {"days_compacted": days_compacted, "rows_compacted": rows_compacted}
+
+def _compact_chunk(db: Session, day_start: datetime, in_day, batch_size: int) -> int:
+    """Delete up to ``batch_size`` of the day's raw rows and add them to its rollups; returns rows deleted"""
+    chunk_ids = select(VerificationLog.id).where(in_day).order_by(VerificationLog.id).limit(batch_size)
+    # A concurrent pass blocks on these rows and then deletes (and counts) none of them
+    deleted = db.execute(
+        delete(VerificationLog).where(VerificationLog.id.in_(chunk_ids.scalar_subquery())).returning(
+            VerificationLog.verification_result, VerificationLog.confidence_score
+        )
+    ).all()
+
+    groups = {}
+    for result, confidence in deleted:
+        count, confidence_sum = groups.get(result, (0, 0.0))
+        groups[result] = (count + 1, confidence_sum + (confidence or 0.0))
+
+    for result, (count, confidence_sum) in groups.items():
+        rollup = db.query(VerificationLogRollup).filter(
+            VerificationLogRollup.day == day_start.date(),
+            VerificationLogRollup.verification_result == result
+        ).first()
+        if rollup is None:
+            rollup = VerificationLogRollup(
+                day=day_start.date(), verification_result=result, count=0, confidence_sum=0.0
+            )
+            db.add(rollup)
+        rollup.count += count
+        rollup.confidence_sum += confidence_sum
+
+    db.commit()
+    return len(deleted)
+
+def run_compaction() -> Dict[str, int]:
+    """Run one compaction pass with its own session"""
+    db = SessionLocal()
+    try:
+        return compact_verification_logs(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def compaction_loop(interval: int = VERIFICATION_LOG_COMPACTION_INTERVAL):
+    """Periodically compact verification logs in a worker thread"""
+    while True:
+        try:
+            await run_in_threadpool(run_compaction)
+        except Exception as e:
+            print(f"Verification log compaction failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+if __name__ == "__main__":
+    print(run_compaction())
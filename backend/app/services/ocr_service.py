@@ -4,76 +4,366 @@ import numpy as np
 from PIL import Image
 import fitz  # PyMuPDF
 import io
-from typing import Optional
+import math
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional, List, Tuple, Dict, Any, AsyncIterator
+from app.utils.config import (
+    OCR_RENDER_ZOOM, OCR_MAX_PAGES, OCR_MAX_PAGE_PIXELS, OCR_MAX_JOB_PIXELS, OCR_MAX_DECODE_PIXELS,
+    OCR_ADAPTIVE, OCR_CONFIDENCE_THRESHOLD, OCR_FAST_PASS_PIXELS,
+)
+from app.utils.metrics import metrics
+
+class OCRBudgetExceeded(Exception):
+    """Raised when an OCR job would go over its page or pixel budget"""
+    pass
+
+class OCRBudget:
+    """Page and pixel allowance for a single OCR job"""
+    def __init__(self, max_pages: int = OCR_MAX_PAGES, max_pixels: int = OCR_MAX_JOB_PIXELS):
+        self.max_pages = max_pages
+        self.max_pixels = max_pixels
+        self.pages = 0
+        self.pixels = 0
+    
+    def check_page_count(self, page_count: int):
+        """Reject documents with more pages than the job may process"""
+        if page_count > self.max_pages:
+            metrics.increment("ocr_budget_exceeded", reason="pages")
+            raise OCRBudgetExceeded(f"Document has {page_count} pages; the limit is {self.max_pages}")
+    
+    def charge(self, pixels: int):
+        """Account for one rendered page or decoded image"""
+        if self.pixels + pixels > self.max_pixels:
+            metrics.increment("ocr_budget_exceeded", reason="pixels")
+            raise OCRBudgetExceeded(
+                f"Document needs more than {self.max_pixels} pixels to process; the job budget is exhausted"
+            )
+        self.pages += 1
+        self.pixels += pixels
+    
+    def report(self):
+        """Record what the job used"""
+        metrics.observe("ocr_job_pages", self.pages)
+        metrics.observe("ocr_job_pixels", self.pixels)
+
+def tier_hit_rates() -> Dict[str, float]:
+    """Share of OCR calls settled by each quality tier"""
+    hits = metrics.counter_by_label("ocr_tier_hits", "tier")
+    total = sum(hits.values())
+    return {tier: round(count / total, 4) for tier, count in hits.items()} if total else {}
 
 class OCRService:
     def __init__(self):
         # Configure tesseract path if needed
         # pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
-        pass
+        self.adaptive = OCR_ADAPTIVE
+        self.confidence_threshold = OCR_CONFIDENCE_THRESHOLD
+        # Quality ladder, cheapest first: (tier name, preprocessing, page segmentation mode)
+        self.tiers = [
+            ("fast", self.fast_preprocess, 6),
+            ("denoise", self.preprocess_image, 6),
+            ("enhanced", self.enhance_image, 6),
+            ("enhanced_sparse", self.enhance_image, 11),
+        ]
     
     async def extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
         """Extract text from PDF using OCR"""
+        budget = OCRBudget()
+        doc = None
         try:
             # Open PDF
             doc = fitz.open("pdf", pdf_bytes)
+            budget.check_page_count(len(doc))
             extracted_text = ""
             
             for page_num in range(len(doc)):
                 page = doc.load_page(page_num)
                 
                 # Convert page to image
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom
-                img_data = pix.tobytes("png")
+                image = await run_in_threadpool(self._render_page, page, budget)
+                page = None
                 
-                # Process with OCR
-                image = Image.open(io.BytesIO(img_data))
+                # Process with OCR, releasing the page image before the next render
                 text = await self.extract_text_from_image(image)
+                image = None
                 extracted_text += f"\n--- Page {page_num + 1} ---\n{text}\n"
             
-            doc.close()
             return extracted_text.strip()
             
+        except OCRBudgetExceeded:
+            raise
         except Exception as e:
             raise Exception(f"OCR extraction failed: {str(e)}")
+        finally:
+            if doc is not None:
+                doc.close()
+            budget.report()
     
-    async def extract_text_from_image(self, image: Image.Image) -> str:
-        """Extract text from image using Tesseract OCR with enhanced preprocessing"""
+    async def iter_verification_text(
+        self, file_bytes: bytes, content_type: str, max_regions: int = 6
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield OCR output cheapest-first so verification can stop early.
+
+        The first page is read region by region (title, name and date blocks)
+        before it is read in full; later pages are read whole. Each item has
+        ``kind`` ('region' or 'page'), ``page`` (1-based), ``page_count`` and ``text``.
+        """
+        budget = OCRBudget()
+        doc = None
         try:
-            # Convert PIL image to OpenCV format
-            opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            if content_type == "application/pdf":
+                doc = fitz.open("pdf", file_bytes)
+                page_count = len(doc)
+                budget.check_page_count(page_count)
+                first_image = await run_in_threadpool(self._render_page, doc.load_page(0), budget) if page_count else None
+            else:
+                page_count = 1
+                first_image = await run_in_threadpool(self.load_image, file_bytes, budget)
+            
+            if first_image is not None:
+                # Detected text blocks on the first page
+                regions = await run_in_threadpool(self.detect_text_regions, first_image, max_regions)
+                for x, y, w, h in regions:
+                    region = first_image.crop((x, y, x + w, y + h))
+                    text = await self.extract_text_from_image(region)
+                    if text:
+                        yield {"kind": "region", "page": 1, "page_count": page_count, "text": text}
+                
+                # Whole first page
+                text = await self.extract_text_from_image(first_image)
+                yield {"kind": "page", "page": 1, "page_count": page_count, "text": text}
+                first_image = None
             
-            # Resize for better OCR (optional, can help with small text)
-            scale_percent = 150  # percent of original size
-            width = int(opencv_image.shape[1] * scale_percent / 100)
-            height = int(opencv_image.shape[0] * scale_percent / 100)
-            dim = (width, height)
-            opencv_image = cv2.resize(opencv_image, dim, interpolation=cv2.INTER_CUBIC)
+            # Remaining pages
+            for page_num in range(1, page_count):
+                image = await run_in_threadpool(self._render_page, doc.load_page(page_num), budget)
+                text = await self.extract_text_from_image(image)
+                image = None
+                yield {"kind": "page", "page": page_num + 1, "page_count": page_count, "text": text}
+                
+        except OCRBudgetExceeded:
+            raise
+        except Exception as e:
+            raise Exception(f"OCR extraction failed: {str(e)}")
+        finally:
+            if doc is not None:
+                doc.close()
+            budget.report()
+    
+    def detect_text_regions(self, image: Image.Image, max_regions: int = 6) -> List[Tuple[int, int, int, int]]:
+        """Locate prominent text blocks on a page as (x, y, w, h) boxes in reading order"""
+        gray = cv2.cvtColor(np.array(image.convert("RGB")), cv2.COLOR_RGB2GRAY)
+        height, width = gray.shape
+        
+        # Stroke edges, binarized
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel)
+        _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        # Merge characters into words and words into lines
+        line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, width // 60), 3))
+        connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, line_kernel)
+        
+        contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        page_area = width * height
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            area = w * h
+            # Skip specks, vertical rules and page borders
+            if h < 8 or area < page_area * 0.0005 or area > page_area * 0.5 or w < h:
+                continue
+            boxes.append((x, y, w, h))
+        
+        # Keep the largest blocks, then pad them and restore reading order
+        boxes = sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)[:max_regions]
+        padded = []
+        for x, y, w, h in boxes:
+            pad = max(4, h // 4)
+            x0, y0 = max(0, x - pad), max(0, y - pad)
+            x1, y1 = min(width, x + w + pad), min(height, y + h + pad)
+            padded.append((x0, y0, x1 - x0, y1 - y0))
+        return sorted(padded, key=lambda b: (b[1], b[0]))
+    
+    def _render_page(self, page, budget: Optional[OCRBudget] = None) -> Image.Image:
+        """Render a PDF page to an image for OCR, downscaling oversized pages
+
+        Callers run this in the threadpool, which keeps the event loop free to
+        schedule work but does not make rendering concurrent: PyMuPDF holds the
+        GIL while it rasterizes, so other Python threads (including the loop's
+        lookups) stall for the duration of each get_pixmap call. The per-page
+        pixel cap is what bounds that pause.
+        """
+        rect = page.rect
+        zoom = OCR_RENDER_ZOOM
+        
+        # Cap the rendered size so poster-sized pages stay within the per-page limit
+        base_pixels = max(rect.width * rect.height, 1)
+        if base_pixels * zoom * zoom > OCR_MAX_PAGE_PIXELS:
+            zoom = math.sqrt(OCR_MAX_PAGE_PIXELS / base_pixels)
+            metrics.increment("ocr_pages_downscaled")
+        
+        if budget is not None:
+            budget.charge(int(rect.width * zoom) * int(rect.height * zoom))
+        
+        # Copy the raw samples straight into PIL (no PNG round trip) and drop the pixmap
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        pix = None
+        return image
+    
+    def load_image(self, image_bytes: bytes, budget: Optional[OCRBudget] = None) -> Image.Image:
+        """Open an uploaded image, charging its size to the budget and downscaling if oversized"""
+        try:
+            # Only the header is read here; pixel data is decoded lazily below
+            image = Image.open(io.BytesIO(image_bytes))
+            pixels = image.width * image.height
+            if pixels > OCR_MAX_JOB_PIXELS:
+                metrics.increment("ocr_budget_exceeded", reason="pixels")
+                raise OCRBudgetExceeded(f"Image has {pixels} pixels; the job budget is {OCR_MAX_JOB_PIXELS}")
             
-            # Convert to grayscale
-            gray = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
+            if pixels > OCR_MAX_PAGE_PIXELS:
+                scale = math.sqrt(OCR_MAX_PAGE_PIXELS / pixels)
+                size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+                # JPEG can decode at reduced size directly; other formats are decoded in full
+                image.draft("RGB", size)
             
-            # Denoise
-            denoised = cv2.medianBlur(gray, 3)
+            decode_pixels = image.width * image.height
+            if decode_pixels > OCR_MAX_DECODE_PIXELS:
+                metrics.increment("ocr_budget_exceeded", reason="decode_pixels")
+                raise OCRBudgetExceeded(
+                    f"Image would decode to {decode_pixels} pixels; the per-image limit is {OCR_MAX_DECODE_PIXELS}"
+                )
+            if budget is not None:
+                budget.charge(decode_pixels)
             
-            # Adaptive thresholding for better binarization
-            thresh = cv2.adaptiveThreshold(
-                denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 2
-            )
+            if pixels > OCR_MAX_PAGE_PIXELS:
+                image = image.convert("RGB")
+                if image.size != size:
+                    image = image.resize(size, Image.LANCZOS)
+                metrics.increment("ocr_pages_downscaled")
+            return image.convert("RGB")
+        except Image.DecompressionBombError as e:
+            metrics.increment("ocr_budget_exceeded", reason="pixels")
+            raise OCRBudgetExceeded(f"Image rejected as a decompression bomb: {str(e)}")
+    
+    async def extract_text_from_image_bytes(self, image_bytes: bytes) -> str:
+        """Decode an uploaded image under a job budget and OCR it"""
+        budget = OCRBudget()
+        try:
+            image = await run_in_threadpool(self.load_image, image_bytes, budget)
+            return await self.extract_text_from_image(image)
+        finally:
+            budget.report()
+    
+    async def extract_text_from_image(self, image: Image.Image) -> str:
+        """Extract text from image using Tesseract OCR with enhanced preprocessing"""
+        pixels = image.width * image.height
+        if pixels > OCR_MAX_JOB_PIXELS:
+            metrics.increment("ocr_budget_exceeded", reason="pixels")
+            raise OCRBudgetExceeded(f"Image has {pixels} pixels; the job budget is {OCR_MAX_JOB_PIXELS}")
+        
+        # Tesseract and OpenCV block, so keep them off the event loop
+        return await run_in_threadpool(self._ocr_image, image)
+    
+    def _ocr_image(self, image: Image.Image) -> str:
+        """Preprocess and OCR one image (blocking)"""
+        try:
+            # Convert PIL image to OpenCV format
+            opencv_image = cv2.cvtColor(np.array(image.convert("RGB")), cv2.COLOR_RGB2BGR)
             
-            # Sharpening (optional, can help with blurry scans)
-            kernel = np.array([[0, -1, 0], [-1, 5,-1], [0, -1, 0]])
-            sharpened = cv2.filter2D(thresh, -1, kernel)
+            if not self.adaptive:
+                custom_config = r'--oem 3 --psm 6'
+                text = pytesseract.image_to_string(self.enhance_image(opencv_image), config=custom_config)
+                return text.strip()
             
-            # OCR
-            custom_config = r'--oem 3 --psm 6'
-            text = pytesseract.image_to_string(sharpened, config=custom_config)
+            # Walk the quality ladder, escalating only while confidence stays low
+            processed = {}
+            best = None
+            empty_tiers = 0
+            for tier, preprocess, psm in self.tiers:
+                if preprocess.__name__ not in processed:
+                    processed[preprocess.__name__] = preprocess(opencv_image)
+                text, confidence = self._ocr_with_confidence(processed[preprocess.__name__], psm)
+                metrics.increment("ocr_tier_attempts", tier=tier)
+                
+                # Rank by total word confidence so a tier that reads a few words confidently
+                # does not beat one that reads the whole page at slightly lower confidence
+                score = confidence * len(text.split())
+                if best is None or score > best[3]:
+                    best = (tier, text, confidence, score)
+                if confidence >= self.confidence_threshold:
+                    break
+                # A blank crop scores 0 on every tier; give up once a second tier also finds no words
+                empty_tiers = empty_tiers + 1 if not text else 0
+                if empty_tiers >= 2:
+                    break
             
-            return text.strip()
+            tier, text, confidence, _ = best
+            metrics.increment("ocr_tier_hits", tier=tier)
+            metrics.observe("ocr_confidence", confidence)
+            return text
             
         except Exception as e:
             raise Exception(f"Image OCR failed: {str(e)}")
     
+    def _ocr_with_confidence(self, image_array: np.ndarray, psm: int) -> Tuple[str, float]:
+        """OCR with per-word data; returns the text and mean word confidence (0-100)"""
+        data = pytesseract.image_to_data(
+            image_array, config=f'--oem 3 --psm {psm}', output_type=pytesseract.Output.DICT
+        )
+        
+        lines: Dict[Tuple[int, int, int], List[str]] = {}
+        confidences = []
+        for i, word in enumerate(data["text"]):
+            word = (word or "").strip()
+            confidence = float(data["conf"][i])
+            if not word or confidence < 0:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+            confidences.append(confidence)
+        
+        text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+        mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return text, mean_confidence
+    
+    def fast_preprocess(self, image_array: np.ndarray) -> np.ndarray:
+        """Cheapest pass: grayscale, downscaled to at most OCR_FAST_PASS_PIXELS"""
+        gray = cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY)
+        pixels = gray.shape[0] * gray.shape[1]
+        if pixels > OCR_FAST_PASS_PIXELS:
+            scale = math.sqrt(OCR_FAST_PASS_PIXELS / pixels)
+            dim = (max(1, int(gray.shape[1] * scale)), max(1, int(gray.shape[0] * scale)))
+            gray = cv2.resize(gray, dim, interpolation=cv2.INTER_AREA)
+        return gray
+    
+    def enhance_image(self, image_array: np.ndarray) -> np.ndarray:
+        """Heaviest preprocessing: upscale, denoise, adaptive threshold and sharpen"""
+        # Resize for better OCR (optional, can help with small text), within the per-page limit
+        pixels = image_array.shape[0] * image_array.shape[1]
+        scale = min(1.5, math.sqrt(OCR_MAX_PAGE_PIXELS / max(pixels, 1)))
+        width = max(1, int(image_array.shape[1] * scale))
+        height = max(1, int(image_array.shape[0] * scale))
+        dim = (width, height)
+        interpolation = cv2.INTER_CUBIC if scale >= 1 else cv2.INTER_AREA
+        resized = cv2.resize(image_array, dim, interpolation=interpolation)
+        
+        # Convert to grayscale
+        gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+        
+        # Denoise
+        denoised = cv2.medianBlur(gray, 3)
+        
+        # Adaptive thresholding for better binarization
+        thresh = cv2.adaptiveThreshold(
+            denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 2
+        )
+        
+        # Sharpening (optional, can help with blurry scans)
+        kernel = np.array([[0, -1, 0], [-1, 5,-1], [0, -1, 0]])
+        return cv2.filter2D(thresh, -1, kernel)
+    
     def preprocess_image(self, image_array: np.ndarray) -> np.ndarray:
         """Advanced image preprocessing for better OCR results"""
         # Convert to grayscale
@@ -1,18 +1,47 @@
 import qrcode
 import uuid
 import base64
+import hashlib
+import hmac
+import json
+import time
 from io import BytesIO
 from typing import Dict, Any
+from jose import jwt, JWTError
+from app.utils.config import SECRET_KEY, SECRET_KEY_PLACEHOLDER, QR_SIGNED_TOKENS, QR_TOKEN_FORMAT
+
+MAC_TOKEN_PREFIX = "v1."
+MAC_LENGTH = 16  # Truncated HMAC-SHA256 bytes; keeps the token small enough for a low QR version
+TOKEN_PATH = "token/"
+
+def has_signing_key() -> bool:
+    """Whether SECRET_KEY is set to something other than the published placeholder"""
+    return bool(SECRET_KEY) and SECRET_KEY != SECRET_KEY_PLACEHOLDER
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
 
 class QRService:
     def __init__(self):
         self.base_url = "http://localhost:8000/api/verify/"
+        self.signed_tokens = QR_SIGNED_TOKENS
+        self.token_format = QR_TOKEN_FORMAT
+        if self.signed_tokens and not has_signing_key():
+            # Anyone could forge tokens signed with the placeholder key
+            raise ValueError("QR_SIGNED_TOKENS requires SECRET_KEY to be set to a private value")
     
     async def generate_qr_code(self, certificate_id: str, certificate_data: Dict[str, Any]) -> Dict[str, str]:
         """Generate QR code for certificate verification"""
         try:
-            # Create verification URL
-            verification_url = f"{self.base_url}{certificate_id}"
+            # Create verification URL (a self-verifying signed token when enabled)
+            if self.signed_tokens:
+                token = self.create_signed_token(certificate_id, certificate_data)
+                verification_url = f"{self.base_url}{TOKEN_PATH}{token}"
+            else:
+                verification_url = f"{self.base_url}{certificate_id}"
             
             # Generate QR code
             qr = qrcode.QRCode(
@@ -43,11 +72,59 @@ class QRService:
         except Exception as e:
             raise Exception(f"QR code generation failed: {str(e)}")
     
+    def create_signed_token(self, certificate_id: str, certificate_data: Dict[str, Any]) -> str:
+        """Encode the certificate's key fields into a signed token"""
+        claims = {"i": certificate_id, "t": int(time.time())}
+        for claim, field in (("o", "institution_name"), ("n", "student_name"), ("c", "course_name"), ("d", "issue_date")):
+            if certificate_data.get(field):
+                claims[claim] = str(certificate_data[field])
+        
+        if self.token_format == "jwt":
+            return jwt.encode(claims, SECRET_KEY, algorithm="HS256")
+        
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        return f"{MAC_TOKEN_PREFIX}{payload}.{self._mac(payload)}"
+    
+    async def verify_signed_token(self, token: str) -> Dict[str, Any]:
+        """Check a token's signature in memory and return its claims"""
+        if not has_signing_key():
+            return {"valid": False, "error": "Signed tokens are not configured"}
+        try:
+            if token.startswith(MAC_TOKEN_PREFIX):
+                payload, _, signature = token[len(MAC_TOKEN_PREFIX):].partition(".")
+                if not hmac.compare_digest(signature, self._mac(payload)):
+                    return {"valid": False, "error": "Invalid token signature"}
+                claims = json.loads(_b64decode(payload))
+            else:
+                claims = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            
+            if not claims.get("i"):
+                return {"valid": False, "error": "Token has no certificate ID"}
+            return {"valid": True, "claims": claims}
+        
+        except JWTError:
+            return {"valid": False, "error": "Invalid token signature"}
+        except Exception as e:
+            return {"valid": False, "error": f"Malformed token: {str(e)}"}
+    
+    def _mac(self, payload: str) -> str:
+        digest = hmac.new(SECRET_KEY.encode(), f"{MAC_TOKEN_PREFIX}{payload}".encode(), hashlib.sha256).digest()
+        return _b64encode(digest[:MAC_LENGTH])
+    
     async def verify_qr_code(self, qr_data: str) -> Dict[str, Any]:
         """Verify QR code and extract certificate ID"""
         try:
             if self.base_url in qr_data:
                 certificate_id = qr_data.replace(self.base_url, "")
+                if certificate_id.startswith(TOKEN_PATH):
+                    token_check = await self.verify_signed_token(certificate_id[len(TOKEN_PATH):])
+                    if not token_check["valid"]:
+                        return token_check
+                    return {
+                        "valid": True,
+                        "certificate_id": token_check["claims"]["i"],
+                        "claims": token_check["claims"]
+                    }
                 return {
                     "valid": True,
                     "certificate_id": certificate_id
@@ -61,4 +138,4 @@ class QRService:
             return {
                 "valid": False,
                 "error": str(e)
-            }
\ No newline at end of file
+            }
@@ -0,0 +1,43 @@
+import threading
+import time
+from typing import FrozenSet, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.services.database import SessionLocal
+from app.models.postgresql_models import RevokedCertificate
+from app.utils.config import REVOCATION_CACHE_TTL
+
+class RevocationCache:
+    """Process-wide set of revoked certificate IDs, reloaded from the database every ``ttl`` seconds"""
+    def __init__(self, ttl: int = REVOCATION_CACHE_TTL):
+        self.ttl = ttl
+        self._revoked: FrozenSet[str] = frozenset()
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    async def is_revoked_async(self, certificate_id: str) -> bool:
+        """Check a certificate ID against the cached set, reloading it in the threadpool when stale"""
+        if self._is_stale():
+            await run_in_threadpool(self.refresh)
+        return certificate_id in self._revoked
+
+    def refresh(self):
+        """Reload the revoked IDs (only one caller queries the database at a time)"""
+        with self._lock:
+            if not self._is_stale():
+                return
+            db = SessionLocal()
+            try:
+                rows = db.query(RevokedCertificate.certificate_id).all()
+                self._revoked = frozenset(row[0] for row in rows)
+                self._loaded_at = time.monotonic()
+            finally:
+                db.close()
+
+    def invalidate(self):
+        """Force a reload on the next check, e.g. right after a revocation"""
+        self._loaded_at = None
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+revocation_cache = RevocationCache()
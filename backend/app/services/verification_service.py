@@ -1,61 +1,203 @@
 from typing import Dict, Any, Optional
 import cv2
 import numpy as np
-from PIL import Image
-import io
-from sqlalchemy.orm import Session
-from app.services.ocr_service import OCRService
+from sqlalchemy.orm import Session, load_only
+from app.services.ocr_service import OCRService, OCRBudgetExceeded
 from app.services.database import get_db_session
+from app.services.qr_service import QRService
+from app.services.revocation_service import revocation_cache
 from app.models.postgresql_models import Certificate
+from app.utils.config import VERIFY_EARLY_EXIT_MARGIN
 from difflib import SequenceMatcher
+from fastapi.concurrency import run_in_threadpool
 import re
 
 class VerificationService:
     def __init__(self):
         self.ocr_service = OCRService()
         self.similarity_threshold = 0.7
+        self.candidate_cutoff = 0.3  # Minimum similarity for a certificate to be considered
+        self.early_exit_margin = VERIFY_EARLY_EXIT_MARGIN
+        self.early_exit_page_slack = 2  # Unread pages are assumed up to this many times the longest page read
     
-    async def verify_certificate(self, file_content: bytes, content_type: str) -> Dict[str, Any]:
+    async def verify_certificate(self, file_content: bytes, content_type: str, early_exit: bool = False) -> Dict[str, Any]:
         """Verify certificate against database records"""
         try:
+            if early_exit:
+                return await self._verify_with_early_exit(file_content, content_type)
+            
             # Extract text from uploaded certificate
             if content_type == "application/pdf":
                 extracted_text = await self.ocr_service.extract_text_from_pdf(file_content)
             else:
-                image = Image.open(io.BytesIO(file_content))
-                extracted_text = await self.ocr_service.extract_text_from_image(image)
+                extracted_text = await self.ocr_service.extract_text_from_image_bytes(file_content)
             
             # Clean and normalize text
             normalized_text = self._normalize_text(extracted_text)
             
             # Search for matching certificates in database
             matches = await self._find_matching_certificates(normalized_text)
-            
-            if matches:
-                best_match = max(matches, key=lambda x: x['similarity'])
+            return self._build_result(matches)
                 
-                if best_match['similarity'] >= self.similarity_threshold:
-                    return {
-                        "status": "valid",
-                        "certificate_id": best_match['certificate_id'],
-                        "confidence": best_match['similarity'],
-                        "institution": best_match.get('institution_name', 'Unknown'),
-                        "match_details": best_match
-                    }
+        except OCRBudgetExceeded:
+            raise
+        except Exception as e:
+            return {
+                "status": "error",
+                "confidence": 0.0,
+                "message": f"Verification failed: {str(e)}"
+            }
+    
+    async def _verify_with_early_exit(self, file_content: bytes, content_type: str) -> Dict[str, Any]:
+        """OCR the cheapest parts of the file first and stop once the outcome is clear"""
+        candidates = await run_in_threadpool(self._load_candidates)
+        progress = {
+            "pages_total": 0,
+            "pages_processed": 0,
+            "regions_processed": 0,
+            "stopped_early": False,
+            "stop_reason": "exhausted"
+        }
+        region_texts = []
+        page_texts = []
+        matches = []
+        max_page_length = 0
+        
+        # Page headers match extract_text_from_pdf; images have none, like extract_text_from_image
+        is_pdf = content_type == "application/pdf"
+        
+        chunks = self.ocr_service.iter_verification_text(file_content, content_type)
+        try:
+            async for chunk in chunks:
+                progress["pages_total"] = chunk["page_count"]
+                if chunk["kind"] == "region":
+                    progress["regions_processed"] += 1
+                    region_texts.append(chunk["text"])
+                    text = "\n".join(region_texts)
+                    if is_pdf:
+                        text = "--- Page 1 ---\n" + text
                 else:
-                    return {
-                        "status": "suspicious",
-                        "confidence": best_match['similarity'],
-                        "message": "Certificate found but with low similarity score",
-                        "possible_matches": matches[:3]  # Top 3 matches
-                    }
+                    progress["pages_processed"] += 1
+                    if is_pdf:
+                        page_texts.append(f"\n--- Page {chunk['page']} ---\n{chunk['text']}\n")
+                    else:
+                        page_texts.append(chunk["text"])
+                    text = "".join(page_texts).strip()
+                    max_page_length = max(max_page_length, len(self._normalize_text(chunk["text"])))
+                
+                normalized_text = self._normalize_text(text)
+                scored = await run_in_threadpool(self._score_candidates_bounded, normalized_text, candidates)
+                matches = self._collect_matches([(similarity, candidate) for similarity, candidate, exact in scored if exact])
+                
+                if chunk["kind"] == "page":
+                    pages_left = progress["pages_total"] - progress["pages_processed"]
+                    reason = self._early_exit_reason(scored, matches, len(normalized_text), pages_left, max_page_length)
+                else:
+                    reason = self._early_exit_reason(scored, matches, len(normalized_text))
+                if reason:
+                    progress["stop_reason"] = reason
+                    progress["stopped_early"] = progress["pages_processed"] < progress["pages_total"]
+                    break
+        finally:
+            await chunks.aclose()
+        
+        result = self._build_result(matches)
+        result["ocr_progress"] = progress
+        return result
+    
+    def _early_exit_reason(self, scored: list, matches: list, text_length: int, pages_left: Optional[int] = None, max_page_length: int = 0) -> Optional[str]:
+        """Decide whether the text read so far already settles the verification (pages_left is None mid-page)"""
+        best = matches[0]['similarity'] if matches else 0.0
+        runner_up = matches[1]['similarity'] if len(matches) > 1 else 0.0
+        if best >= self.similarity_threshold and best - runner_up >= self.early_exit_margin:
+            return "match"
+        
+        if pages_left is None:
+            return None
+        
+        # Generous cap on the unread text: every remaining page twice as long as the longest seen
+        remaining_length = pages_left * max_page_length * self.early_exit_page_slack
+        
+        # Upper bounds stand in for skipped candidates, which only makes this check more cautious
+        for similarity, candidate, _ in scored:
+            candidate_length = len(candidate["text"])
+            # A candidate longer than the text read so far could still be matched by unread pages
+            if text_length < candidate_length:
+                return None
+            if self._best_possible_similarity(similarity, text_length, candidate_length, remaining_length) > self.candidate_cutoff:
+                return None
+        return "no_candidates"
+    
+    def _best_possible_similarity(self, similarity: float, text_length: int, candidate_length: int, remaining_length: float) -> float:
+        """Upper bound on a candidate's final ratio if up to ``remaining_length`` more characters all matched it"""
+        total_length = text_length + candidate_length
+        if not total_length:
+            return 0.0
+        matched = similarity * total_length / 2
+        # Matches can grow by at most the extra text and never beyond the candidate's length;
+        # the ratio peaks where the candidate becomes fully matched
+        extra = min(remaining_length, max(0.0, candidate_length - matched))
+        return 2 * (matched + extra) / (total_length + extra)
+    
+    def _build_result(self, matches: list) -> Dict[str, Any]:
+        """Turn ranked matches into a verification result"""
+        if matches:
+            best_match = max(matches, key=lambda x: x['similarity'])
+            
+            if best_match['similarity'] >= self.similarity_threshold:
+                return {
+                    "status": "valid",
+                    "certificate_id": best_match['certificate_id'],
+                    "confidence": best_match['similarity'],
+                    "institution": best_match.get('institution_name', 'Unknown'),
+                    "match_details": best_match
+                }
             else:
+                return {
+                    "status": "suspicious",
+                    "confidence": best_match['similarity'],
+                    "message": "Certificate found but with low similarity score",
+                    "possible_matches": matches[:3]  # Top 3 matches
+                }
+        else:
+            return {
+                "status": "invalid",
+                "confidence": 0.0,
+                "message": "No matching certificate found in database"
+            }
+    
+    async def verify_token(self, token: str) -> Dict[str, Any]:
+        """Verify a signed QR token in memory; the DB is only consulted via the cached revocation set"""
+        try:
+            token_check = await QRService().verify_signed_token(token)
+            if not token_check["valid"]:
                 return {
                     "status": "invalid",
                     "confidence": 0.0,
-                    "message": "No matching certificate found in database"
+                    "message": token_check["error"]
                 }
-                
+            
+            claims = token_check["claims"]
+            certificate_id = claims["i"]
+            if await revocation_cache.is_revoked_async(certificate_id):
+                return {
+                    "status": "revoked",
+                    "certificate_id": certificate_id,
+                    "confidence": 0.0,
+                    "message": "Certificate has been revoked"
+                }
+            
+            return {
+                "status": "valid",
+                "certificate_id": certificate_id,
+                "confidence": 1.0,
+                "institution": claims.get("o"),
+                "student_name": claims.get("n"),
+                "course_name": claims.get("c"),
+                "issue_date": claims.get("d"),
+                "verified_offline": True
+            }
+            
         except Exception as e:
             return {
                 "status": "error",
@@ -66,6 +208,14 @@ class VerificationService:
     async def verify_by_id(self, certificate_id: str) -> Dict[str, Any]:
         """Verify certificate by ID (for QR code verification)"""
         try:
+            if await revocation_cache.is_revoked_async(certificate_id):
+                return {
+                    "status": "revoked",
+                    "certificate_id": certificate_id,
+                    "confidence": 0.0,
+                    "message": "Certificate has been revoked"
+                }
+            
             # Get database session
             db_gen = get_db_session()
             db = next(db_gen)
@@ -117,47 +267,103 @@ class VerificationService:
     async def _find_matching_certificates(self, normalized_text: str) -> list:
         """Find matching certificates in database"""
         try:
-            # Get database session
-            db_gen = get_db_session()
-            db = next(db_gen)
-            
-            try:
-                # Get all certificates with extracted text
-                certificates = db.query(Certificate).filter(
-                    Certificate.extracted_text.isnot(None)
-                ).all()
-                
-                matches = []
-                
-                for cert in certificates:
-                    if cert.extracted_text:
-                        # Normalize database text
-                        db_normalized = self._normalize_text(cert.extracted_text)
-                        
-                        # Calculate similarity
-                        similarity = SequenceMatcher(None, normalized_text, db_normalized).ratio()
-                        
-                        if similarity > 0.3:  # Minimum threshold for consideration
-                            matches.append({
-                                "certificate_id": cert.certificate_id,
-                                "similarity": similarity,
-                                "institution_name": cert.institution_name,
-                                "student_name": cert.student_name,
-                                "course_name": cert.course_name,
-                                "certificate_type": cert.certificate_type
-                            })
-                
-                # Sort by similarity descending
-                matches.sort(key=lambda x: x['similarity'], reverse=True)
-                return matches
-                
-            finally:
-                db.close()
+            # Loading and scoring every candidate is blocking work; run it off the event loop
+            candidates = await run_in_threadpool(self._load_candidates)
+            scored = await run_in_threadpool(self._score_candidates, normalized_text, candidates)
+            return self._collect_matches(scored)
                 
         except Exception as e:
             print(f"Error finding matches: {str(e)}")
             return []
     
+    def _load_candidates(self) -> list:
+        """Load certificates with extracted text, normalized for comparison"""
+        # Get database session
+        db_gen = get_db_session()
+        db = next(db_gen)
+        
+        try:
+            # Get all certificates with extracted text
+            certificates = db.query(Certificate).options(
+                load_only(
+                    Certificate.certificate_id,
+                    Certificate.institution_name,
+                    Certificate.student_name,
+                    Certificate.course_name,
+                    Certificate.certificate_type,
+                    Certificate.extracted_text
+                )
+            ).filter(
+                Certificate.extracted_text.isnot(None)
+            ).all()
+            
+            candidates = []
+            for cert in certificates:
+                if cert.extracted_text:
+                    candidates.append({
+                        "text": self._normalize_text(cert.extracted_text),
+                        "info": {
+                            "certificate_id": cert.certificate_id,
+                            "institution_name": cert.institution_name,
+                            "student_name": cert.student_name,
+                            "course_name": cert.course_name,
+                            "certificate_type": cert.certificate_type
+                        }
+                    })
+            return candidates
+            
+        finally:
+            db.close()
+    
+    def _score_candidates(self, normalized_text: str, candidates: list) -> list:
+        """Score every candidate against the text as (similarity, candidate) pairs"""
+        return [
+            (SequenceMatcher(None, normalized_text, candidate["text"]).ratio(), candidate)
+            for candidate in candidates
+        ]
+    
+    def _score_candidates_bounded(self, normalized_text: str, candidates: list) -> list:
+        """Score candidates as (similarity, candidate, exact) triples, skipping ratio() where a cheap bound settles it
+
+        Candidates whose quick upper bound cannot clear the cutoff, or cannot come
+        within the early-exit margin of a confirmed match, keep that bound with
+        ``exact`` False instead of a full SequenceMatcher pass.
+        """
+        bounded = []
+        for candidate in candidates:
+            matcher = SequenceMatcher(None, normalized_text, candidate["text"])
+            bound = matcher.real_quick_ratio()
+            if bound > self.candidate_cutoff:
+                bound = matcher.quick_ratio()
+            bounded.append((bound, candidate, matcher))
+        
+        # Most promising first, so a strong match is confirmed before the rest are checked
+        bounded.sort(key=lambda item: item[0], reverse=True)
+        scored = []
+        best = 0.0
+        for bound, candidate, matcher in bounded:
+            below_cutoff = bound <= self.candidate_cutoff
+            outside_margin = best >= self.similarity_threshold and bound <= best - self.early_exit_margin
+            if below_cutoff or outside_margin:
+                scored.append((bound, candidate, False))
+            else:
+                similarity = matcher.ratio()
+                best = max(best, similarity)
+                scored.append((similarity, candidate, True))
+        return scored
+    
+    def _collect_matches(self, scored: list) -> list:
+        """Keep candidates above the cutoff, best first"""
+        matches = [
+            dict(candidate["info"], similarity=similarity)
+            for similarity, candidate in scored
+            if similarity > self.candidate_cutoff
+        ]
+        
+        # Sort by similarity descending
+        matches.sort(key=lambda x: x['similarity'], reverse=True)
+        return matches
+    
     def _calculate_text_similarity(self, text1: str, text2: str) -> float:
         """Calculate similarity between two text strings"""
         # Use SequenceMatcher for basic similarity
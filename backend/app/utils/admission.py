@@ -0,0 +1,116 @@
+# backend/app/utils/admission.py
+import asyncio
+import math
+import time
+from typing import Dict, Optional
+from starlette.responses import JSONResponse
+from app.utils.metrics import metrics
+from app.utils.config import (
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_EXPENSIVE_CONCURRENCY, ADMISSION_EXPENSIVE_QUEUE,
+    ADMISSION_LOOKUP_CONCURRENCY, ADMISSION_LOOKUP_QUEUE,
+    ADMISSION_STANDARD_CONCURRENCY, ADMISSION_STANDARD_QUEUE,
+)
+
+def classify_request(method: str, path: str) -> str:
+    """Map a request to its cost lane: 'expensive' (OCR), 'lookup' (QR scans, health) or 'standard'"""
+    if method == "POST" and (path.startswith("/api/upload/") or path.rstrip("/") == "/api/verify"):
+        return "expensive"
+    if method in ("GET", "HEAD") and (path == "/health" or path.startswith("/api/verify/")):
+        return "lookup"
+    return "standard"
+
+class AdmissionLane:
+    """Concurrency limit plus a bounded wait queue for one class of requests"""
+    def __init__(self, name: str, concurrency: int, queue_depth: int, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.avg_service_time = 1.0  # Seconds, moving average used for Retry-After
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; False means the request should be rejected"""
+        if self._semaphore is None:
+            # Created lazily so it binds to the running event loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        started = time.monotonic()
+        if not self._semaphore.locked():
+            # A slot is free; acquire() returns without yielding
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.queue_depth:
+                self._reject("queue_full")
+                return False
+
+            self.waiting += 1
+            self._report()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout")
+                return False
+            finally:
+                self.waiting -= 1
+
+        metrics.observe("admission_queue_wait_seconds", time.monotonic() - started, lane=self.name)
+        self.active += 1
+        self._report()
+        return True
+
+    def release(self, service_time: float):
+        self.active -= 1
+        self._semaphore.release()
+        self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+        self._report()
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is expected to drain"""
+        return max(1, math.ceil(self.avg_service_time * (self.waiting + 1) / self.concurrency))
+
+    def _reject(self, reason: str):
+        metrics.increment("admission_rejected", lane=self.name, reason=reason)
+        self._report()
+
+    def _report(self):
+        metrics.set_gauge("admission_active", self.active, lane=self.name)
+        metrics.set_gauge("admission_waiting", self.waiting, lane=self.name)
+
+def default_lanes() -> Dict[str, AdmissionLane]:
+    return {
+        "expensive": AdmissionLane("expensive", ADMISSION_EXPENSIVE_CONCURRENCY, ADMISSION_EXPENSIVE_QUEUE),
+        # Separate lane so QR lookups keep reserved capacity while OCR requests pile up
+        "lookup": AdmissionLane("lookup", ADMISSION_LOOKUP_CONCURRENCY, ADMISSION_LOOKUP_QUEUE),
+        "standard": AdmissionLane("standard", ADMISSION_STANDARD_CONCURRENCY, ADMISSION_STANDARD_QUEUE),
+    }
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that admits each request through its cost lane or fails fast with 429"""
+    def __init__(self, app, lanes: Optional[Dict[str, AdmissionLane]] = None):
+        self.app = app
+        self.lanes = lanes or default_lanes()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        lane = self.lanes[classify_request(scope["method"], scope["path"])]
+        if not await lane.acquire():
+            response = JSONResponse(
+                {"detail": f"Server busy ({lane.name} requests); retry later"},
+                status_code=429,
+                headers={"Retry-After": str(lane.retry_after())}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release(time.monotonic() - started)
@@ -0,0 +1,13 @@
+# backend/app/utils/auth.py
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException
+from app.utils.config import ADMIN_API_KEY
+
+async def require_admin_key(x_admin_key: Optional[str] = Header(None)):
+    """Dependency guarding admin-only endpoints with the configured ADMIN_API_KEY"""
+    if not ADMIN_API_KEY:
+        # Fail closed: without a configured key nobody can call admin endpoints
+        raise HTTPException(status_code=503, detail="Admin actions are disabled; set ADMIN_API_KEY to enable them")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin key")
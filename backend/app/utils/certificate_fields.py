@@ -0,0 +1,41 @@
+# backend/app/utils/certificate_fields.py
+import re
+from datetime import datetime
+from typing import Dict, Any
+
+def parse_certificate_fields(text: str, include_issue_date: bool = True) -> Dict[str, Any]:
+    """Best-effort extraction of labelled fields from OCR text; missing fields are omitted"""
+    fields = {}
+    text = text or ""
+    try:
+        # Institution
+        inst_match = re.search(r"(?:institution|college|university)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
+        if inst_match:
+            fields["institution_name"] = inst_match.group(1).strip()
+
+        # Student name
+        student_match = re.search(r"(?:student\s*name|name)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
+        if student_match:
+            fields["student_name"] = student_match.group(1).strip()
+
+        # Course name
+        course_match = re.search(r"(?:course\s*name|course|program|degree)\s*[:\-]?\s*(.+)", text, flags=re.IGNORECASE)
+        if course_match:
+            fields["course_name"] = course_match.group(1).strip()
+
+        # Issue/Date
+        if include_issue_date:
+            date_match = re.search(r"(?:issue\s*date|date\s*of\s*issue|issued\s*on|date)\s*[:\-]?\s*([0-9]{1,2}[\-/ ]?[A-Za-z]{3,9}[\-/ ]?[0-9]{2,4}|[0-9]{4}[\-/][0-9]{2}[\-/][0-9]{2})", text, flags=re.IGNORECASE)
+            if date_match:
+                raw_date = date_match.group(1).strip()
+                # Best-effort parse a few common formats
+                for fmt in ("%d-%b-%Y", "%d %B %Y", "%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y"):
+                    try:
+                        fields["issue_date"] = datetime.strptime(raw_date, fmt)
+                        break
+                    except Exception:
+                        continue
+    except Exception:
+        # Parsing should never fail the caller; return whatever was found
+        pass
+    return fields
@@ -0,0 +1,64 @@
+# backend/app/utils/metrics.py
+import threading
+from typing import Dict, Any, Tuple
+
+
+class MetricsRegistry:
+    """In-process counters and value summaries, exposed at /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._counter_labels: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def _key(self, name: str, labels: Dict[str, Any]) -> str:
+        if not labels:
+            return name
+        label_str = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+        return f"{name}{{{label_str}}}"
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """Add ``value`` to a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._counter_labels.setdefault(key, (name, dict(labels)))
+
+    def counter_by_label(self, name: str, label: str) -> Dict[str, float]:
+        """Totals of counter ``name`` grouped by the value of one of its labels"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for key, (counter_name, labels) in self._counter_labels.items():
+                if counter_name == name and label in labels:
+                    value = str(labels[label])
+                    totals[value] = totals.get(value, 0) + self._counters[key]
+        return totals
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record one observation (count, sum and max are kept)"""
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.setdefault(key, {"count": 0, "sum": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a point-in-time value"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of all metrics"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": {key: dict(summary) for key, summary in self._summaries.items()}
+            }
+
+
+metrics = MetricsRegistry()
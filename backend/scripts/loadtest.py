@@ -0,0 +1,363 @@
+"""Load-test the API and report throughput and latency percentiles per endpoint.
+
+By default this boots ``app.main`` with uvicorn against a throwaway SQLite
+database, seeds it with generated certificates, then drives a weighted mix of
+requests at a fixed concurrency. Results are written as JSON so runs can be
+compared with ``--compare``.
+
+    cd backend
+    python scripts/loadtest.py --concurrency 32 --duration 60
+    python scripts/loadtest.py --url http://localhost:8000 --mix verify_id=90,analytics=10
+"""
+import argparse
+import http.client
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "verify_id=50,verify_file=10,upload_legacy=5,upload_digital=5,analytics=30"
+
+INSTITUTIONS = ["Anna University", "Madras Institute of Technology", "PSG College of Technology"]
+COURSES = ["Bachelor of Engineering", "Master of Science", "Diploma in Data Science"]
+NAMES = ["Priya Raman", "Arjun Kumar", "Meena Iyer", "Rahul Das", "Kavya Nair"]
+
+
+# Certificate generation
+
+def _certificate_lines():
+    return [
+        "CERTIFICATE OF COMPLETION",
+        f"Institution: {random.choice(INSTITUTIONS)}",
+        f"Student Name: {random.choice(NAMES)}",
+        f"Course: {random.choice(COURSES)}",
+        f"Issue Date: {random.randint(1, 28):02d}/{random.randint(1, 12):02d}/{random.randint(2015, 2025)}",
+        f"Serial: {uuid.uuid4().hex[:12].upper()}",
+    ]
+
+def make_pdf() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=842, height=595)  # A4 landscape
+    for i, line in enumerate(_certificate_lines()):
+        page.insert_text((72, 100 + i * 48), line, fontsize=24 if i == 0 else 18)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def make_png() -> bytes:
+    image = Image.new("RGB", (1684, 1190), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(_certificate_lines()):
+        draw.text((140, 200 + i * 90), line, fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# HTTP client
+
+def encode_multipart(field: str, filename: str, content_type: str, data: bytes):
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    body = head + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+class Client:
+    """One keep-alive connection per worker thread"""
+    def __init__(self, base_url: str, timeout: float):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None):
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                response = self.conn.getresponse()
+                payload = response.read()
+                return response.status, payload
+            except (http.client.HTTPException, OSError) as e:
+                self.conn.close()
+                self.conn = None
+                # Retry once if the server closed an idle keep-alive connection
+                if attempt or not isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)):
+                    raise
+
+    def upload(self, path: str, filename: str, content_type: str, data: bytes):
+        body, multipart_type = encode_multipart("file", filename, content_type, data)
+        return self.request("POST", path, body, {"Content-Type": multipart_type})
+
+
+# Scenarios
+
+ENDPOINTS = {
+    "upload_legacy": "POST /api/upload/legacy",
+    "upload_digital": "POST /api/upload/digital",
+    "verify_file": "POST /api/verify/",
+    "verify_id": "GET /api/verify/{certificate_id}",
+    "analytics": "GET /api/dashboard/analytics",
+    "health": "GET /health",
+}
+
+class Scenarios:
+    """One method per entry in ENDPOINTS; each returns the HTTP status"""
+    def __init__(self, pdfs, pngs, certificate_ids):
+        self.pdfs = pdfs
+        self.pngs = pngs
+        self.certificate_ids = certificate_ids
+        self.lock = threading.Lock()
+
+    def _remember(self, status, payload):
+        if status == 200:
+            try:
+                certificate_id = json.loads(payload).get("certificate_id")
+            except ValueError:
+                return
+            if certificate_id:
+                with self.lock:
+                    self.certificate_ids.append(certificate_id)
+
+    def upload_legacy(self, client):
+        status, payload = client.upload("/api/upload/legacy", "cert.pdf", "application/pdf", random.choice(self.pdfs))
+        self._remember(status, payload)
+        return status
+
+    def upload_digital(self, client):
+        status, payload = client.upload("/api/upload/digital", "cert.png", "image/png", random.choice(self.pngs))
+        self._remember(status, payload)
+        return status
+
+    def verify_file(self, client):
+        status, _ = client.upload("/api/verify/", "cert.pdf", "application/pdf", random.choice(self.pdfs))
+        return status
+
+    def verify_id(self, client):
+        with self.lock:
+            certificate_id = random.choice(self.certificate_ids) if self.certificate_ids else str(uuid.uuid4())
+        status, _ = client.request("GET", f"/api/verify/{certificate_id}")
+        return status
+
+    def analytics(self, client):
+        status, _ = client.request("GET", "/api/dashboard/analytics")
+        return status
+
+    def health(self, client):
+        status, _ = client.request("GET", "/health")
+        return status
+
+def parse_mix(mix: str):
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown scenario in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+# Server lifecycle
+
+def start_server(port: int, database_url: str):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    client = Client(f"http://127.0.0.1:{port}", timeout=2)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("Server exited during startup")
+        try:
+            if client.request("GET", "/health")[0] == 200:
+                return process
+        except OSError:
+            pass
+        # Back off after any failed attempt, including non-200 responses such as 429
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server did not become healthy within 30s")
+
+
+# Reporting
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for endpoint, status, latency in samples:
+        entry = endpoints.setdefault(endpoint, {"latencies": [], "statuses": {}})
+        entry["latencies"].append(latency)
+        entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+
+    report = {}
+    for endpoint, entry in sorted(endpoints.items()):
+        latencies = sorted(entry["latencies"])
+        errors = sum(count for status, count in entry["statuses"].items() if not status.startswith("2"))
+        report[endpoint] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "statuses": entry["statuses"],
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+        }
+    return report
+
+def print_report(result, baseline=None):
+    print(f"\n{result['total_requests']} requests in {result['duration_s']}s "
+          f"at concurrency {result['config']['concurrency']}: {result['throughput_rps']} req/s")
+    header = f"{'endpoint':<36}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, stats in result["endpoints"].items():
+        print(f"{endpoint:<36}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>9}"
+              f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}")
+        if baseline and endpoint in baseline["endpoints"]:
+            base = baseline["endpoints"][endpoint]
+            print(f"{'  vs baseline':<36}{'':>13}{stats['throughput_rps'] - base['throughput_rps']:>+9.2f}"
+                  f"{stats['p50_ms'] - base['p50_ms']:>+9.2f}{stats['p95_ms'] - base['p95_ms']:>+9.2f}"
+                  f"{stats['p99_ms'] - base['p99_ms']:>+9.2f}")
+
+
+# Main
+
+def run(args):
+    weights = parse_mix(args.mix)
+    print("Generating certificate files...")
+    pdfs = [make_pdf() for _ in range(args.files)]
+    pngs = [make_png() for _ in range(args.files)]
+
+    process = None
+    base_url = args.url
+    if not base_url:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+        print(f"Starting server on port {args.port} ({database_url})...")
+        process = start_server(args.port, database_url)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        scenarios = Scenarios(pdfs, pngs, [])
+        seed_client = Client(base_url, args.timeout)
+        print(f"Seeding {args.seed} certificates...")
+        for i in range(args.seed):
+            if i % 2 == 0:
+                scenarios.upload_legacy(seed_client)
+            else:
+                scenarios.upload_digital(seed_client)
+
+        names = list(weights)
+        weight_values = [weights[name] for name in names]
+        samples = []
+        samples_lock = threading.Lock()
+        measure_from = time.time() + args.warmup
+        stop_at = measure_from + args.duration
+
+        def worker():
+            client = Client(base_url, args.timeout)
+            local = []
+            while time.time() < stop_at:
+                name = random.choices(names, weights=weight_values)[0]
+                started = time.perf_counter()
+                try:
+                    status = getattr(scenarios, name)(client)
+                except Exception:
+                    status = "error"
+                latency = time.perf_counter() - started
+                # Only requests completing inside the measured window count, matching the rps divisor
+                if measure_from <= time.time() <= stop_at:
+                    local.append((ENDPOINTS[name], status, latency))
+            with samples_lock:
+                samples.extend(local)
+
+        print(f"Running {args.concurrency} workers for {args.warmup}s warmup + {args.duration}s...")
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for _ in range(args.concurrency):
+                pool.submit(worker)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    result = {
+        "label": args.label,
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "url": args.url or "local",
+            "database_url": args.database_url or "sqlite",
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": weights,
+            "seed": args.seed,
+        },
+        "duration_s": args.duration,
+        "total_requests": len(samples),
+        "throughput_rps": round(len(samples) / args.duration, 2),
+        "endpoints": summarize(samples, args.duration),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(args.output_dir, f"{stamp}-{args.label}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved results to {path}")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the certificate validator API")
+    parser.add_argument("--url", help="Target an already running server instead of booting one")
+    parser.add_argument("--database-url", help="Database for the booted server (default: temporary SQLite)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the booted server")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=20, help="Certificates uploaded before the run")
+    parser.add_argument("--files", type=int, default=10, help="Distinct generated files per type")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--label", default="run", help="Name stored with the results")
+    parser.add_argument("--output-dir", default="loadtest_results")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
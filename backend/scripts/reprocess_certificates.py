@@ -0,0 +1,277 @@
+"""Re-run OCR and derived-field extraction over stored certificates.
+
+Walks the ``certificates`` table in id order, one batch at a time. Each batch
+is re-extracted from the stored ``file_data`` across a process pool, then
+written back in a single transaction. Progress is checkpointed after every
+batch, so an interrupted run picks up where it stopped.
+
+    cd backend
+    python scripts/reprocess_certificates.py --dry-run --report reprocess_diff.jsonl
+    python scripts/reprocess_certificates.py --workers 8 --rate 20
+    python scripts/reprocess_certificates.py --fields-only      # re-derive fields from stored text, no OCR
+    python scripts/reprocess_certificates.py --retry-failed     # re-run only the rows that failed earlier
+"""
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.database import SessionLocal
+from app.services.ocr_service import OCRService
+from app.models.postgresql_models import Certificate
+from app.utils.certificate_fields import parse_certificate_fields
+
+FIELDS = ("extracted_text", "institution_name", "student_name", "course_name", "issue_date")
+
+
+# Worker (runs in a child process)
+
+def reprocess_row(row: dict, run_ocr: bool) -> dict:
+    """Recompute text and derived fields for one certificate"""
+    try:
+        text = row["extracted_text"]
+        if run_ocr:
+            ocr_service = OCRService()
+            if row["file_type"] == "application/pdf":
+                text = asyncio.run(ocr_service.extract_text_from_pdf(row["file_data"]))
+            else:
+                text = asyncio.run(ocr_service.extract_text_from_image_bytes(row["file_data"]))
+
+        # Upload only parses the issue date for legacy certificates
+        fields = parse_certificate_fields(text, include_issue_date=row["certificate_type"] == "legacy")
+        return {"extracted_text": text, **{field: fields.get(field) for field in FIELDS[1:]}}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+# Checkpointing
+
+def run_filters(args) -> dict:
+    """The options that decide which rows a pass visits and how; a checkpoint only resumes a pass with the same ones"""
+    return {"type": args.type, "fields_only": args.fields_only, "dry_run": args.dry_run}
+
+def default_checkpoint_path(filters: dict) -> str:
+    parts = ["reprocess_checkpoint"]
+    if filters["type"]:
+        parts.append(filters["type"])
+    if filters["fields_only"]:
+        parts.append("fields-only")
+    if filters["dry_run"]:
+        parts.append("dry-run")
+    return ".".join(parts) + ".json"
+
+def new_checkpoint(filters: dict) -> dict:
+    return {"filters": filters, "last_id": 0, "processed": 0, "changed": 0, "errors": 0, "failed_ids": [], "complete": False}
+
+def load_checkpoint(path: str, filters: dict) -> dict:
+    if not (path and os.path.exists(path)):
+        return new_checkpoint(filters)
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("filters") != filters:
+        # Resuming from another pass's last_id would silently skip rows this pass has never seen
+        raise SystemExit(
+            f"Checkpoint {path} was written for {checkpoint.get('filters')}, not {filters}; "
+            "use --restart or a different --checkpoint"
+        )
+    return checkpoint
+
+def save_checkpoint(path: str, checkpoint: dict):
+    checkpoint["updated_at"] = datetime.utcnow().isoformat()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)  # Atomic, so a crash never leaves a torn checkpoint
+
+
+# Diffing
+
+def _comparable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def diff_row(row: dict, result: dict) -> dict:
+    """Fields whose recomputed value differs from the stored one"""
+    changes = {}
+    for field in FIELDS:
+        if field == "issue_date" and row["certificate_type"] != "legacy":
+            continue
+        old, new = _comparable(row[field]), _comparable(result[field])
+        if old != new:
+            changes[field] = {"old": old, "new": new}
+    return changes
+
+def text_diff(old: str, new: str, max_lines: int = 40) -> list:
+    lines = list(difflib.unified_diff((old or "").splitlines(), (new or "").splitlines(), "stored", "reprocessed", lineterm=""))
+    return lines[:max_lines]
+
+
+# Batch loop
+
+def _columns(run_ocr: bool) -> list:
+    columns = [
+        Certificate.id, Certificate.certificate_id, Certificate.certificate_type, Certificate.file_type,
+        Certificate.extracted_text, Certificate.institution_name, Certificate.student_name,
+        Certificate.course_name, Certificate.issue_date,
+    ]
+    if run_ocr:
+        columns.append(Certificate.file_data)
+    return columns
+
+def fetch_batch(db, after_id: int, batch_size: int, certificate_type: str, run_ocr: bool) -> list:
+    query = db.query(*_columns(run_ocr)).filter(Certificate.id > after_id)
+    if certificate_type:
+        query = query.filter(Certificate.certificate_type == certificate_type)
+    # Keyset walk: each batch seeks past the last processed id
+    return [dict(row._mapping) for row in query.order_by(Certificate.id).limit(batch_size).all()]
+
+def fetch_ids(db, ids: list, run_ocr: bool) -> list:
+    query = db.query(*_columns(run_ocr)).filter(Certificate.id.in_(ids))
+    return [dict(row._mapping) for row in query.order_by(Certificate.id).all()]
+
+def process_batch(db, pool, rows: list, args, run_ocr: bool, report) -> tuple:
+    """Reprocess, diff and (unless dry-run) write back one batch; returns (changed count, failed ids)"""
+    results = list(pool.map(reprocess_row, rows, [run_ocr] * len(rows)))
+
+    changed = 0
+    failed_ids = []
+    for row, result in zip(rows, results):
+        if "error" in result:
+            # Failed rows are skipped; their ids are kept for --retry-failed
+            failed_ids.append(row["id"])
+            print(f"  {row['certificate_id']}: {result['error']}")
+            continue
+        changes = diff_row(row, result)
+        if not changes:
+            continue
+        changed += 1
+        if report:
+            entry = {"certificate_id": row["certificate_id"], "changes": {k: v for k, v in changes.items() if k != "extracted_text"}}
+            if "extracted_text" in changes:
+                entry["text_diff"] = text_diff(row["extracted_text"], result["extracted_text"])
+            report.write(json.dumps(entry) + "\n")
+        if not args.dry_run:
+            db.query(Certificate).filter(Certificate.id == row["id"]).update(
+                {field: result[field] for field in changes}, synchronize_session=False
+            )
+
+    if not args.dry_run:
+        db.commit()
+    if report:
+        report.flush()
+    return changed, failed_ids
+
+def throttle(args, row_count: int, batch_started: float):
+    """Throttle to protect the live database"""
+    if args.rate:
+        min_duration = row_count / args.rate
+        remaining = min_duration - (time.monotonic() - batch_started)
+        if remaining > 0:
+            time.sleep(remaining)
+    if args.pause:
+        time.sleep(args.pause)
+
+def retry_failed(db, pool, checkpoint: dict, checkpoint_path: str, args, run_ocr: bool, report):
+    """Reprocess exactly the checkpoint's failed ids, dropping each one that now succeeds"""
+    pending = list(checkpoint["failed_ids"])
+    print(f"Retrying {len(pending)} failed rows")
+    for start in range(0, len(pending), args.batch_size):
+        batch_started = time.monotonic()
+        batch_ids = pending[start:start + args.batch_size]
+        rows = fetch_ids(db, batch_ids, run_ocr)
+        db.rollback()
+
+        changed, failed_ids = process_batch(db, pool, rows, args, run_ocr, report)
+
+        # Ids that no longer exist are dropped along with the ones that succeeded
+        retried = set(batch_ids) - set(failed_ids)
+        checkpoint["failed_ids"] = [row_id for row_id in checkpoint["failed_ids"] if row_id not in retried]
+        checkpoint["errors"] -= len(retried)
+        checkpoint["changed"] += changed
+        save_checkpoint(checkpoint_path, checkpoint)
+
+        print(f"Retried {min(start + args.batch_size, len(pending))}/{len(pending)} "
+              f"({len(checkpoint['failed_ids'])} still failing)")
+        throttle(args, len(rows), batch_started)
+
+def run(args):
+    run_ocr = not args.fields_only
+    filters = run_filters(args)
+    checkpoint_path = args.checkpoint or default_checkpoint_path(filters)
+    checkpoint = load_checkpoint(None if args.restart else checkpoint_path, filters)
+    if args.retry_failed:
+        if not checkpoint["failed_ids"]:
+            print("No failed rows to retry")
+            return checkpoint
+    elif checkpoint["complete"]:
+        print(f"Previous pass finished at {checkpoint['updated_at']}; starting a new one")
+        checkpoint = new_checkpoint(filters)
+    elif checkpoint["last_id"]:
+        print(f"Resuming after id {checkpoint['last_id']} ({checkpoint['processed']} already processed)")
+
+    report = open(args.report, "a") if args.report else None
+    db = SessionLocal()
+    started = time.monotonic()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            if args.retry_failed:
+                retry_failed(db, pool, checkpoint, checkpoint_path, args, run_ocr, report)
+            else:
+                while args.limit is None or checkpoint["processed"] < args.limit:
+                    batch_started = time.monotonic()
+                    rows = fetch_batch(db, checkpoint["last_id"], args.batch_size, args.type, run_ocr)
+                    # Release the read snapshot so the batch's file_data is not held between batches
+                    db.rollback()
+                    if not rows:
+                        checkpoint["complete"] = True
+                        save_checkpoint(checkpoint_path, checkpoint)
+                        break
+
+                    batch_changed, failed_ids = process_batch(db, pool, rows, args, run_ocr, report)
+
+                    checkpoint["last_id"] = rows[-1]["id"]
+                    checkpoint["processed"] += len(rows)
+                    checkpoint["changed"] += batch_changed
+                    checkpoint["errors"] += len(failed_ids)
+                    checkpoint["failed_ids"].extend(failed_ids)
+                    save_checkpoint(checkpoint_path, checkpoint)
+
+                    elapsed = time.monotonic() - started
+                    rate = checkpoint["processed"] / elapsed if elapsed else 0
+                    print(f"Processed {checkpoint['processed']} (last id {checkpoint['last_id']}, "
+                          f"{checkpoint['changed']} changed, {checkpoint['errors']} errors, {rate:.1f} rows/s)")
+
+                    throttle(args, len(rows), batch_started)
+    finally:
+        db.close()
+        if report:
+            report.close()
+
+    verb = "would change" if args.dry_run else "changed"
+    print(f"Done: {checkpoint['processed']} processed, {checkpoint['changed']} {verb}, {checkpoint['errors']} errors")
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run OCR and derived fields over stored certificates")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="OCR processes (default: all cores)")
+    parser.add_argument("--type", choices=["legacy", "digital"], help="Only reprocess this certificate type")
+    parser.add_argument("--fields-only", action="store_true", help="Re-derive fields from stored text without re-running OCR")
+    parser.add_argument("--dry-run", action="store_true", help="Compute changes without writing them")
+    parser.add_argument("--report", help="Append a JSONL diff of changed certificates to this file")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: reprocess_checkpoint[.<type>][.fields-only][.dry-run].json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the beginning")
+    parser.add_argument("--retry-failed", action="store_true", help="Only reprocess the rows the checkpoint lists as failed")
+    parser.add_argument("--limit", type=int, help="Stop after roughly this many rows")
+    parser.add_argument("--rate", type=float, default=0, help="Max rows per second (0 = unlimited)")
+    parser.add_argument("--pause", type=float, default=0, help="Seconds to sleep between batches")
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app.services.verification_service import VerificationService
+
+FIRST_PAGE = "Certificate of Completion"
+SECOND_PAGE = "This certifies that Jane Doe has completed the course Advanced Data Structures and Algorithms with distinction"
+THIRD_PAGE = "Issued by the Institute of Technology on 12 March 2024, registration number 2024-ADS-0042"
+
+
+def _service(chunks, stored_texts):
+    service = VerificationService()
+
+    async def iter_verification_text(file_bytes, content_type):
+        for chunk in chunks:
+            yield chunk
+
+    service.ocr_service.iter_verification_text = iter_verification_text
+    service._load_candidates = lambda: [
+        {"text": service._normalize_text(text), "info": {"certificate_id": f"CERT-{i}", "institution_name": "Institute"}}
+        for i, text in enumerate(stored_texts)
+    ]
+    return service
+
+
+def _pdf_pages(pages):
+    return [{"kind": "page", "page": n, "page_count": len(pages), "text": text} for n, text in enumerate(pages, 1)]
+
+
+def _pdf_text(pages):
+    return "".join(f"\n--- Page {n} ---\n{text}\n" for n, text in enumerate(pages, 1)).strip()
+
+
+def test_short_first_page_does_not_rule_out_candidates():
+    pages = [FIRST_PAGE, SECOND_PAGE, THIRD_PAGE]
+    service = _service(_pdf_pages(pages), [_pdf_text(pages)])
+
+    result = asyncio.run(service._verify_with_early_exit(b"", "application/pdf"))
+
+    assert result["status"] == "valid"
+    assert result["certificate_id"] == "CERT-0"
+    assert result["ocr_progress"]["stop_reason"] != "no_candidates"
+
+
+def test_unrelated_document_exits_once_bound_is_below_cutoff():
+    stored = "Certificate of Completion awarded to Jane Doe"
+    pages = ["zzzz qqqq xxxx " * 20] * 3
+    service = _service(_pdf_pages(pages), [stored])
+
+    result = asyncio.run(service._verify_with_early_exit(b"", "application/pdf"))
+
+    assert result["status"] == "invalid"
+    assert result["ocr_progress"]["stop_reason"] == "no_candidates"
+    assert result["ocr_progress"]["pages_processed"] == 1
+
+
+def test_image_text_has_no_page_header():
+    text = f"{FIRST_PAGE}\n{SECOND_PAGE}"
+    chunks = [{"kind": "page", "page": 1, "page_count": 1, "text": text}]
+    service = _service(chunks, [text])
+
+    result = asyncio.run(service._verify_with_early_exit(b"", "image/png"))
+
+    assert result["status"] == "valid"
+    assert result["confidence"] == 1.0
+
+
+def test_bounded_scoring_only_skips_candidates_it_can_rule_out():
+    text = _pdf_text([FIRST_PAGE, SECOND_PAGE, THIRD_PAGE])
+    stored_texts = [text, text.replace("Jane Doe", "John Roe"), THIRD_PAGE, "Unrelated receipt for office supplies"]
+    service = _service([], stored_texts)
+    normalized_text = service._normalize_text(text)
+    candidates = service._load_candidates()
+
+    exact = {candidate["info"]["certificate_id"]: similarity for similarity, candidate in service._score_candidates(normalized_text, candidates)}
+    bounded = service._score_candidates_bounded(normalized_text, candidates)
+
+    assert len(bounded) == len(candidates)
+    assert not all(is_exact for _, _, is_exact in bounded)
+    for similarity, candidate, is_exact in bounded:
+        true_similarity = exact[candidate["info"]["certificate_id"]]
+        if is_exact:
+            assert similarity == true_similarity
+        else:
+            assert similarity >= true_similarity